@@ -4,13 +4,98 @@ from __future__ import annotations
 
 import asyncio
 import logging
-from typing import Any, Dict, Optional, Tuple
+import socket
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Tuple
 
-from .model_manager import ModelManager
-from .utils import decode_message, encode_message
+from .model_manager import ModelManager, TokenChunk
+from .utils import (
+    FRAME_HEADER_BYTES,
+    FRAME_MAGIC,
+    MAX_FRAME_BYTES,
+    decode_message,
+    dump_json,
+    encode_framed_message,
+    encode_message,
+    frame_message,
+)
 
 LOGGER = logging.getLogger(__name__)
 
+# Token frames are coalesced up to this many bytes before hitting the socket.
+STREAM_FLUSH_BYTES = 16 * 1024
+# Upper bound on tokens carried by a single "tokens" frame (batch_tokens mode).
+TOKENS_PER_FRAME = 32
+# Transport buffer watermarks; generous enough that drain() rarely blocks mid-stream.
+WRITE_BUFFER_HIGH = 256 * 1024
+WRITE_BUFFER_LOW = 64 * 1024
+
+# Shared stand-in for requests without params; handlers must never mutate it.
+_EMPTY_PARAMS: Dict[str, Any] = {}
+
+
+class _Framing:
+    """Wire format for one connection, with its constant replies pre-encoded."""
+
+    def __init__(
+        self,
+        encode: Callable[[Dict[str, Any]], bytes],
+        frame: Callable[[bytes], bytes],
+    ):
+        self.encode = encode
+        self.frame = frame
+        self.pong_frame = encode({"type": "pong"})
+        self.invalid_json_frame = encode({"type": "error", "message": "invalid_json"})
+        self.unknown_request_frame = encode({"type": "error", "message": "unknown_request"})
+
+    async def read(self, reader: asyncio.StreamReader, prefix: bytes = b"") -> Optional[bytes]:
+        """Return the next raw message, or None once the client hangs up."""
+        raise NotImplementedError
+
+
+class _NewlineFraming(_Framing):
+    """Newline-delimited JSON, the default wire format."""
+
+    async def read(self, reader: asyncio.StreamReader, prefix: bytes = b"") -> Optional[bytes]:
+        if prefix == b"\n":
+            return prefix
+        line = prefix + await reader.readline()
+        return line or None
+
+
+class _LengthPrefixedFraming(_Framing):
+    """JSON bodies behind a 4-byte big-endian length, read without newline scanning."""
+
+    async def read(self, reader: asyncio.StreamReader, prefix: bytes = b"") -> Optional[bytes]:
+        try:
+            header = prefix + await reader.readexactly(FRAME_HEADER_BYTES - len(prefix))
+            size = int.from_bytes(header, "big")
+            if size > MAX_FRAME_BYTES:
+                # The stream cannot be resynchronised, so hang up on the client.
+                LOGGER.warning("Closing connection: frame of %d bytes exceeds %d", size, MAX_FRAME_BYTES)
+                return None
+            return await reader.readexactly(size)
+        except asyncio.IncompleteReadError:
+            return None
+
+
+def _contiguous_runs(batch: List[TokenChunk], limit: int) -> Iterator[Tuple[int, List[str]]]:
+    """Group (index, token) pairs into (start, tokens) runs with consecutive indices."""
+    start = 0
+    run: List[str] = []
+    for index, token in batch:
+        if run and (index != start + len(run) or len(run) >= limit):
+            yield start, run
+            run = []
+        if not run:
+            start = index
+        run.append(token)
+    if run:
+        yield start, run
+
+
+_NEWLINE_FRAMING = _NewlineFraming(encode_message, lambda body: body + b"\n")
+_LENGTH_PREFIXED_FRAMING = _LengthPrefixedFraming(encode_framed_message, frame_message)
+
 
 class BrokerServer:
     """Thin wrapper around asyncio.start_server with JSON helpers."""
@@ -19,6 +104,14 @@ class BrokerServer:
         self.host = host
         self.port = port
         self.model_manager = model_manager or ModelManager()
+        # The model name never changes, so the head of every completion frame is fixed.
+        self._completion_head = b"".join(
+            (
+                b'{"type":"completion","result":{"model":',
+                dump_json(self.model_manager.model_name),
+                b',"prompt":',
+            )
+        )
         self._server: Optional[asyncio.AbstractServer] = None
 
     async def start(self) -> asyncio.AbstractServer:
@@ -39,21 +132,33 @@ class BrokerServer:
     async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
         peer = writer.get_extra_info("peername")
         LOGGER.debug("Client connected: %s", peer)
+        self._tune_transport(writer)
         try:
-            while True:
-                raw_line = await reader.readline()
-                if not raw_line:
-                    break
+            # Length-prefixed clients announce themselves with a 0x00 first byte;
+            # anything else is treated as newline-delimited JSON.
+            first = await reader.read(1)
+            if not first:
+                return
+            framing = _LENGTH_PREFIXED_FRAMING if first == FRAME_MAGIC else _NEWLINE_FRAMING
+            LOGGER.debug("Client %s uses %s", peer, type(framing).__name__)
 
+            # Bind hot per-connection methods once; the loop below runs per frame.
+            read = framing.read
+            write = writer.write
+            drain = writer.drain
+            decode = decode_message
+            process = self._process_request
+            raw_message = await read(reader, first)
+            while raw_message is not None:
                 try:
-                    request = decode_message(raw_line)
+                    request = decode(raw_message)
                 except ValueError as exc:
                     LOGGER.warning("Dropping bad payload from %s: %s", peer, exc)
-                    writer.write(encode_message({"type": "error", "message": "invalid_json"}))
-                    await writer.drain()
-                    continue
-
-                await self._process_request(request, writer)
+                    write(framing.invalid_json_frame)
+                    await drain()
+                else:
+                    await process(request, writer, framing)
+                raw_message = await read(reader)
         except asyncio.CancelledError:  # pragma: no cover - shutdown path
             raise
         except Exception:
@@ -63,35 +168,49 @@ class BrokerServer:
             await writer.wait_closed()
             LOGGER.debug("Client disconnected: %s", peer)
 
-    async def _process_request(self, request: Dict[str, Any], writer: asyncio.StreamWriter) -> None:
+    async def _process_request(
+        self,
+        request: Mapping[str, Any],
+        writer: asyncio.StreamWriter,
+        framing: _Framing = _NEWLINE_FRAMING,
+    ) -> None:
         """Route incoming requests to the right handler."""
         kind = request.get("type", "completion")
         if kind == "ping":
-            writer.write(encode_message({"type": "pong"}))
+            writer.write(framing.pong_frame)
             await writer.drain()
             return
         if kind != "completion":
-            writer.write(encode_message({"type": "error", "message": "unknown_request"}))
+            writer.write(framing.unknown_request_frame)
             await writer.drain()
             return
 
-        await self._handle_completion(request, writer)
+        await self._handle_completion(request, writer, framing)
 
-    async def _handle_completion(self, request: Dict[str, Any], writer: asyncio.StreamWriter) -> None:
+    async def _handle_completion(
+        self,
+        request: Mapping[str, Any],
+        writer: asyncio.StreamWriter,
+        framing: _Framing = _NEWLINE_FRAMING,
+    ) -> None:
         prompt = request.get("prompt") or ""
-        params = dict(request.get("params") or {})
+        raw_params = request.get("params") or _EMPTY_PARAMS
         stream_flag = request.get("stream")
         if stream_flag is None:
-            stream = bool(params.pop("stream", True))
+            stream_flag = raw_params.get("stream", True)
+        stream = bool(stream_flag)
+        # Only copy params when "stream" has to be stripped before forwarding.
+        if "stream" in raw_params:
+            params = {key: value for key, value in raw_params.items() if key != "stream"}
         else:
-            stream = bool(stream_flag)
-            params.pop("stream", None)
+            params = raw_params
 
         if stream:
-            await self._stream_completion(prompt, params, writer)
+            batch_tokens = bool(request.get("batch_tokens"))
+            await self._stream_completion(prompt, params, writer, framing, batch_tokens)
         else:
             result = await self.model_manager.generate(prompt, **params)
-            writer.write(encode_message({"type": "completion", "result": result}))
+            writer.write(framing.encode({"type": "completion", "result": result}))
             await writer.drain()
 
     async def _stream_completion(
@@ -99,16 +218,68 @@ class BrokerServer:
         prompt: str,
         params: Dict[str, Any],
         writer: asyncio.StreamWriter,
+        framing: _Framing = _NEWLINE_FRAMING,
+        batch_tokens: bool = False,
     ) -> None:
-        tokens: list[str] = []
-        async for index, token in self.model_manager.stream_tokens(prompt, **params):
-            tokens.append(token)
-            writer.write(encode_message({"type": "token", "index": index, "token": token}))
-            await writer.drain()
+        pieces: list[str] = []
+        buffer = bytearray()
+        append_piece = pieces.append
+        encode = framing.encode
+        write = writer.write
+        drain = writer.drain
+
+        async def flush() -> None:
+            write(bytes(buffer))
+            buffer.clear()
+            await drain()
+
+        async for batch in self.model_manager.stream_batches(prompt, **params):
+            if batch_tokens:
+                # Clients that opt in get one "tokens" frame per run of ready tokens.
+                for start, tokens in _contiguous_runs(batch, TOKENS_PER_FRAME):
+                    pieces.extend(tokens)
+                    buffer += encode({"type": "tokens", "start": start, "tokens": tokens})
+                    if len(buffer) >= STREAM_FLUSH_BYTES:
+                        await flush()
+            else:
+                for index, token in batch:
+                    append_piece(token)
+                    buffer += encode({"type": "token", "index": index, "token": token})
+                    if len(buffer) >= STREAM_FLUSH_BYTES:
+                        await flush()
+            # The backend has nothing else ready, so flush now to keep latency low.
+            if buffer:
+                await flush()
+
+        body = self._completion_body(prompt, params, "".join(pieces))
+        write(framing.frame(body))
+        await drain()
 
-        result = self.model_manager.format_result(prompt, params, "".join(tokens))
-        writer.write(encode_message({"type": "completion", "result": result}))
-        await writer.drain()
+    def _completion_body(self, prompt: str, params: Dict[str, Any], output: str) -> bytes:
+        """Encode a completion frame matching ModelManager.format_result from a fixed template."""
+        return b"".join(
+            (
+                self._completion_head,
+                dump_json(prompt),
+                b',"params":',
+                dump_json(params),
+                b',"output":',
+                dump_json(output),
+                b"}}",
+            )
+        )
+
+    @staticmethod
+    def _tune_transport(writer: asyncio.StreamWriter) -> None:
+        """Disable Nagle and widen the write buffer for latency-sensitive token frames."""
+        writer.transport.set_write_buffer_limits(high=WRITE_BUFFER_HIGH, low=WRITE_BUFFER_LOW)
+        sock = writer.get_extra_info("socket")
+        if sock is None or sock.family not in (socket.AF_INET, socket.AF_INET6):
+            return
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError as exc:  # pragma: no cover - platform specific
+            LOGGER.debug("Unable to set TCP_NODELAY: %s", exc)
 
     @staticmethod
     def _format_socket(sock: Any) -> str:
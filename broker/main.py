@@ -10,6 +10,11 @@ import sys
 from .handlers import BrokerServer
 from .utils import read_env
 
+try:  # pragma: no cover - optional dependency (not available on Windows)
+    import uvloop
+except ImportError:  # pragma: no cover - optional dependency
+    uvloop = None  # type: ignore[assignment]
+
 
 def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="CodeSage local broker")
@@ -28,7 +33,11 @@ def main(argv: list[str] | None = None) -> None:
     args = parse_args(argv)
     logging.basicConfig(level=args.log_level.upper(), format="%(levelname)s %(name)s: %(message)s")
     try:
-        asyncio.run(amain(args))
+        if uvloop is not None:
+            uvloop.run(amain(args))
+        else:
+            logging.debug("uvloop unavailable; using the default asyncio event loop")
+            asyncio.run(amain(args))
     except KeyboardInterrupt:
         logging.info("Broker interrupted by user")
 
@@ -5,8 +5,10 @@ from __future__ import annotations
 import asyncio
 import logging
 import threading
+from collections import deque
 from pathlib import Path
-from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple
+from types import MappingProxyType
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator, List, Mapping, Optional, Tuple
 
 from .utils import read_env, read_env_int, resolve_models_dir
 
@@ -19,6 +21,20 @@ except ImportError:  # pragma: no cover - optional dependency
 LOGGER = logging.getLogger(__name__)
 TokenChunk = Tuple[int, str]
 
+# The echo backend streams the prompt back in slices of this many characters.
+ECHO_CHUNK_CHARS = 64
+
+# Shared read-only defaults returned as-is when a request sets no llama.cpp params.
+_DEFAULT_LLAMA_PARAMS: Mapping[str, Any] = MappingProxyType(
+    {"max_tokens": 256, "temperature": 0.6, "top_p": 0.95, "stop": None}
+)
+_LLAMA_PARAM_TYPES: Tuple[Tuple[str, Optional[Callable[[Any], Any]]], ...] = (
+    ("max_tokens", int),
+    ("temperature", float),
+    ("top_p", float),
+    ("stop", None),
+)
+
 
 class BaseBackend:
     """Interface for model backends."""
@@ -31,6 +47,11 @@ class BaseBackend:
     async def stream_tokens(self, prompt: str, **params: Any) -> AsyncIterator[TokenChunk]:
         raise NotImplementedError
 
+    async def stream_batches(self, prompt: str, **params: Any) -> AsyncIterator[List[TokenChunk]]:
+        """Yield tokens grouped by what is ready without waiting on the model."""
+        async for chunk in self.stream_tokens(prompt, **params):
+            yield [chunk]
+
 
 class EchoBackend(BaseBackend):
     """Fallback backend that simply echoes the prompt."""
@@ -45,8 +66,13 @@ class EchoBackend(BaseBackend):
         await asyncio.sleep(0)
         if not prompt:
             return
-        for idx, char in enumerate(prompt):
-            yield idx, char
+        for idx in range(0, len(prompt), ECHO_CHUNK_CHARS):
+            yield idx, prompt[idx : idx + ECHO_CHUNK_CHARS]
+
+
+def _log_producer_failure(future: "asyncio.Future[None]") -> None:
+    if not future.cancelled() and future.exception() is not None:
+        LOGGER.warning("llama.cpp stream producer failed after the client left", exc_info=future.exception())
 
 
 class LlamaBackend(BaseBackend):
@@ -61,63 +87,115 @@ class LlamaBackend(BaseBackend):
         self.n_ctx = n_ctx
         self.n_threads = n_threads
         self._llama: Optional[Llama] = None  # type: ignore[valid-type]
-        self._lock = threading.Lock()
+        # Set once the model is loaded; read without locking on the hot path.
+        self._ready = False
+        self._load_lock = asyncio.Lock()
 
     async def generate(self, prompt: str, **params: Any) -> str:
         llama_params = self._llama_params(params)
-        return await asyncio.to_thread(self._generate_sync, prompt, llama_params)
+        llm = await self._ensure_model()
+        return await asyncio.to_thread(self._generate_sync, llm, prompt, llama_params)
 
     async def stream_tokens(self, prompt: str, **params: Any) -> AsyncIterator[TokenChunk]:
+        async for batch in self.stream_batches(prompt, **params):
+            for chunk in batch:
+                yield chunk
+
+    async def stream_batches(self, prompt: str, **params: Any) -> AsyncIterator[List[TokenChunk]]:
         llama_params = self._llama_params(params)
+        llm = await self._ensure_model()
         loop = asyncio.get_running_loop()
-        queue: asyncio.Queue[Optional[TokenChunk]] = asyncio.Queue()
+        pending: Deque[TokenChunk] = deque()
+        pending_lock = threading.Lock()
+        ready = asyncio.Event()
+        # Guarded by pending_lock; the producer only wakes the loop when the
+        # consumer has drained everything it was last told about.
+        wakeup_scheduled = False
+        finished = False
+        # Set when the consumer goes away so the worker stops generating early.
+        stopped = threading.Event()
 
         def producer() -> None:
+            nonlocal wakeup_scheduled, finished
             try:
-                for chunk in self._stream_sync(prompt, llama_params):
-                    loop.call_soon_threadsafe(queue.put_nowait, chunk)
+                for chunk in self._stream_sync(llm, prompt, llama_params):
+                    if stopped.is_set():
+                        break
+                    with pending_lock:
+                        pending.append(chunk)
+                        if wakeup_scheduled:
+                            continue
+                        wakeup_scheduled = True
+                    loop.call_soon_threadsafe(ready.set)
             finally:
-                loop.call_soon_threadsafe(queue.put_nowait, None)
-
-        threading.Thread(target=producer, daemon=True).start()
-
-        while True:
-            chunk = await queue.get()
-            if chunk is None:
-                break
-            yield chunk
-
-    def _ensure_model(self) -> Llama:
-        if self._llama is None:
-            with self._lock:
-                if self._llama is None:
-                    LOGGER.info("Loading llama.cpp model from %s", self.model_path)
-                    self._llama = Llama(  # type: ignore[call-arg]
-                        model_path=str(self.model_path),
-                        n_ctx=self.n_ctx,
-                        n_threads=self.n_threads,
-                        logits_all=False,
-                    )
+                with pending_lock:
+                    finished = True
+                loop.call_soon_threadsafe(ready.set)
+
+        # Reuse the loop's default executor (as generate() does via to_thread)
+        # instead of paying for a fresh thread on every stream.
+        producer_done = loop.run_in_executor(None, producer)
+
+        completed = False
+        try:
+            while True:
+                await ready.wait()
+                with pending_lock:
+                    batch = list(pending)
+                    pending.clear()
+                    wakeup_scheduled = False
+                    done = finished
+                ready.clear()
+                if batch:
+                    yield batch
+                if done:
+                    break
+            completed = True
+            await producer_done
+        finally:
+            if not completed:
+                # The consumer stopped early (disconnect/aclose); let the worker
+                # wind down in the background and still collect its outcome.
+                stopped.set()
+                producer_done.add_done_callback(_log_producer_failure)
+
+    async def _ensure_model(self) -> Llama:
+        if self._ready:
+            return self._llama  # type: ignore[return-value]
+        # Concurrent first callers wait here instead of each blocking a worker thread.
+        async with self._load_lock:
+            if not self._ready:
+                LOGGER.info("Loading llama.cpp model from %s", self.model_path)
+                self._llama = await asyncio.to_thread(
+                    Llama,  # type: ignore[arg-type]
+                    model_path=str(self.model_path),
+                    n_ctx=self.n_ctx,
+                    n_threads=self.n_threads,
+                    logits_all=False,
+                )
+                self._ready = True
         return self._llama  # type: ignore[return-value]
 
-    def _generate_sync(self, prompt: str, params: Dict[str, Any]) -> str:
-        llm = self._ensure_model()
+    @staticmethod
+    def _generate_sync(llm: Llama, prompt: str, params: Mapping[str, Any]) -> str:
         completion = llm.create_completion(prompt=prompt, stream=False, **params)
         return completion["choices"][0]["text"]
 
-    def _stream_sync(self, prompt: str, params: Dict[str, Any]) -> Iterator[TokenChunk]:
-        llm = self._ensure_model()
+    @staticmethod
+    def _stream_sync(llm: Llama, prompt: str, params: Mapping[str, Any]) -> Iterator[TokenChunk]:
         for idx, packet in enumerate(llm.create_completion(prompt=prompt, stream=True, **params)):
             yield idx, packet["choices"][0]["text"]
 
     @staticmethod
-    def _llama_params(params: Dict[str, Any]) -> Dict[str, Any]:
-        return {
-            "max_tokens": int(params.get("max_tokens", 256)),
-            "temperature": float(params.get("temperature", 0.6)),
-            "top_p": float(params.get("top_p", 0.95)),
-            "stop": params.get("stop"),
-        }
+    def _llama_params(params: Dict[str, Any]) -> Mapping[str, Any]:
+        if not params:
+            return _DEFAULT_LLAMA_PARAMS
+        llama_params: Dict[str, Any] = dict(_DEFAULT_LLAMA_PARAMS)
+        for key, coerce in _LLAMA_PARAM_TYPES:
+            if key in params:
+                value = params[key]
+                llama_params[key] = value if coerce is None or type(value) is coerce else coerce(value)
+        return llama_params
 
 
 class ModelManager:
@@ -143,14 +221,18 @@ class ModelManager:
         self.model_name = resolved_model.name if self.backend.name == "llama" else self.backend.name
 
     async def generate(self, prompt: str, **params: Any) -> Dict[str, Any]:
-        copied_params = dict(params)
-        output = await self.backend.generate(prompt, **copied_params)
-        return self.format_result(prompt, copied_params, output)
+        # **params is already a fresh dict and backends never mutate it, so no copy.
+        output = await self.backend.generate(prompt, **params)
+        return self.format_result(prompt, params, output)
 
     async def stream_tokens(self, prompt: str, **params: Any) -> AsyncIterator[TokenChunk]:
         async for chunk in self.backend.stream_tokens(prompt, **params):
             yield chunk
 
+    async def stream_batches(self, prompt: str, **params: Any) -> AsyncIterator[List[TokenChunk]]:
+        async for batch in self.backend.stream_batches(prompt, **params):
+            yield batch
+
     def format_result(self, prompt: str, params: Dict[str, Any], output: str) -> Dict[str, Any]:
         return {
             "model": self.model_name,
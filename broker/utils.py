@@ -2,17 +2,42 @@
 
 from __future__ import annotations
 
+import functools
 import json
 import os
 from pathlib import Path
-from typing import Any, Dict
+from types import MappingProxyType
+from typing import Any, Dict, Mapping
 
+try:  # pragma: no cover - optional dependency
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None  # type: ignore[assignment]
 
+
+# Length-prefixed frames cap out below 16 MiB so the first header byte is always
+# 0x00, which can never start a newline-delimited JSON message.
+FRAME_HEADER_BYTES = 4
+FRAME_MAGIC = b"\x00"
+MAX_FRAME_BYTES = (1 << 24) - 1
+
+# Byte-exact keepalive frames skip JSON parsing entirely. The decoded request is
+# shared between calls, so it is a read-only mapping.
+_PING_REQUEST: Mapping[str, Any] = MappingProxyType({"type": "ping"})
+_CANONICAL_REQUESTS: Dict[bytes, Mapping[str, Any]] = {
+    b'{"type":"ping"}': _PING_REQUEST,
+    b'{"type":"ping"}\n': _PING_REQUEST,
+    b'{"type": "ping"}\n': _PING_REQUEST,
+}
+
+
+@functools.lru_cache(maxsize=None)
 def read_env(key: str, default: str) -> str:
     """Return environment variable values with a simple default."""
     return os.environ.get(key, default)
 
 
+@functools.lru_cache(maxsize=None)
 def read_env_int(key: str, default: int) -> int:
     """Read an integer environment variable with a fallback."""
     value = os.environ.get(key)
@@ -24,6 +49,12 @@ def read_env_int(key: str, default: int) -> int:
         return default
 
 
+def clear_env_cache() -> None:
+    """Forget memoized environment lookups (e.g. after tests patch os.environ)."""
+    read_env.cache_clear()
+    read_env_int.cache_clear()
+
+
 def resolve_models_dir(default: str = "./models") -> Path:
     """Resolve the models directory location."""
     return Path(read_env("MODELS_DIR", default)).expanduser().resolve()
@@ -31,12 +62,37 @@ def resolve_models_dir(default: str = "./models") -> Path:
 
 def encode_message(payload: Dict[str, Any]) -> bytes:
     """Serialize a JSON payload into a newline-delimited byte string."""
-    return (json.dumps(payload, separators=(",", ":")) + "\n").encode("utf-8")
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_APPEND_NEWLINE)
+    return b"".join((json.dumps(payload, separators=(",", ":")).encode("utf-8"), b"\n"))
+
 
+def dump_json(value: Any) -> bytes:
+    """Serialize any JSON value to compact UTF-8 bytes without a terminator."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
 
-def decode_message(raw_line: bytes) -> Dict[str, Any]:
+
+def frame_message(body: bytes) -> bytes:
+    """Put a 4-byte big-endian length prefix in front of an encoded JSON body."""
+    return len(body).to_bytes(FRAME_HEADER_BYTES, "big") + body
+
+
+def encode_framed_message(payload: Dict[str, Any]) -> bytes:
+    """Serialize a JSON payload behind a 4-byte big-endian length prefix."""
+    return frame_message(dump_json(payload))
+
+
+def decode_message(raw_line: bytes) -> Mapping[str, Any]:
     """Deserialize a JSON payload received from the wire."""
+    canonical = _CANONICAL_REQUESTS.get(raw_line)
+    if canonical is not None:
+        return canonical
     try:
+        if orjson is not None:
+            return orjson.loads(raw_line)
         return json.loads(raw_line.decode("utf-8").strip())
-    except json.JSONDecodeError as exc:  # pragma: no cover - thin wrapper
+    except ValueError as exc:  # pragma: no cover - thin wrapper
         raise ValueError("Received malformed JSON payload") from exc
+
@@ -1,10 +1,28 @@
+import asyncio
+import os
+import threading
+import time
 import unittest
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+from unittest import mock
 
-from broker.model_manager import ModelManager
-from broker.utils import decode_message, encode_message
+from broker.handlers import BrokerServer, _contiguous_runs
+from broker.model_manager import LlamaBackend, ModelManager
+from broker.utils import (
+    FRAME_HEADER_BYTES,
+    clear_env_cache,
+    decode_message,
+    encode_framed_message,
+    encode_message,
+    read_env,
+)
 
 
 class ModelManagerTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        clear_env_cache()
+
     async def test_echo_generate_returns_prompt(self) -> None:
         manager = ModelManager(backend="echo")
         result = await manager.generate("Hello CodeSage")
@@ -18,13 +36,203 @@ class ModelManagerTests(unittest.IsolatedAsyncioTestCase):
             tokens.append(token)
         self.assertEqual("".join(tokens), "abc")
 
+    async def test_stream_batches_preserve_order(self) -> None:
+        manager = ModelManager(backend="echo")
+        chunks = []
+        prompt = "x" * 130
+        async for batch in manager.stream_batches(prompt):
+            chunks.extend(batch)
+        self.assertEqual([index for index, _ in chunks], [0, 64, 128])
+        self.assertEqual("".join(token for _, token in chunks), prompt)
+
+
+class FakeLlama:
+    """Stand-in for llama_cpp.Llama that streams one packet per token."""
+
+    loads = 0
+
+    def __init__(self, **kwargs: Any) -> None:
+        FakeLlama.loads += 1
+        time.sleep(0.01)
+        self.token_delay = 0.0
+        self.fail_after: int | None = None
+        self.produced = 0
+        self.closed = threading.Event()
+
+    def create_completion(self, prompt: str, stream: bool, **params: Any) -> Any:
+        if not stream:
+            return {"choices": [{"text": prompt}]}
+        return self._packets(params["max_tokens"])
+
+    def _packets(self, count: int) -> Iterator[Dict[str, Any]]:
+        try:
+            for idx in range(count):
+                if self.fail_after is not None and idx == self.fail_after:
+                    raise RuntimeError("llama.cpp failed")
+                if self.token_delay:
+                    time.sleep(self.token_delay)
+                self.produced += 1
+                yield {"choices": [{"text": f"t{idx} "}]}
+        finally:
+            self.closed.set()
+
+
+class LlamaBackendTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        FakeLlama.loads = 0
+        patcher = mock.patch("broker.model_manager.Llama", FakeLlama)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.backend = LlamaBackend(Path("fake.gguf"), n_ctx=128, n_threads=1)
+
+    async def _collect(self, max_tokens: int, delay: float = 0.0) -> List[List[Any]]:
+        batches = []
+        async for batch in self.backend.stream_batches("prompt", max_tokens=max_tokens):
+            batches.append(batch)
+            if delay:
+                await asyncio.sleep(delay)
+        return batches
+
+    async def test_stream_batches_are_contiguous_and_complete(self) -> None:
+        batches = await self._collect(200)
+        indices = [index for batch in batches for index, _ in batch]
+        self.assertEqual(indices, list(range(200)))
+
+    async def test_slow_consumer_receives_fewer_batches_than_tokens(self) -> None:
+        llm = await self.backend._ensure_model()
+        llm.token_delay = 0.0005
+        batches = await self._collect(200, delay=0.01)
+        self.assertEqual(sum(len(batch) for batch in batches), 200)
+        self.assertLess(len(batches), 200)
+
+    async def test_concurrent_first_calls_load_model_once(self) -> None:
+        results = await asyncio.gather(*(self.backend.generate("hi") for _ in range(5)))
+        self.assertEqual(results, ["hi"] * 5)
+        self.assertEqual(FakeLlama.loads, 1)
+
+    async def test_producer_error_reaches_consumer(self) -> None:
+        llm = await self.backend._ensure_model()
+        llm.fail_after = 3
+        with self.assertRaisesRegex(RuntimeError, "llama.cpp failed"):
+            await self._collect(50)
+
+    async def test_aclose_stops_producer_early(self) -> None:
+        llm = await self.backend._ensure_model()
+        llm.token_delay = 0.002
+        stream = self.backend.stream_batches("prompt", max_tokens=1000)
+        await stream.__anext__()
+        await stream.aclose()
+        self.assertTrue(await asyncio.to_thread(llm.closed.wait, 2))
+        self.assertLess(llm.produced, 1000)
+
+
+class BrokerServerTests(unittest.TestCase):
+    def test_completion_body_matches_format_result(self) -> None:
+        manager = ModelManager(backend="echo")
+        server = BrokerServer("127.0.0.1", 0, manager)
+        params = {"max_tokens": 8, "stop": ["\n"]}
+        body = server._completion_body("say \"hi\"", params, "hi")
+        expected = {"type": "completion", "result": manager.format_result("say \"hi\"", params, "hi")}
+        self.assertEqual(decode_message(body), expected)
+
+    def test_contiguous_runs_split_on_gaps_and_limit(self) -> None:
+        batch = [(0, "a"), (1, "b"), (2, "c"), (10, "d"), (11, "e")]
+        runs = list(_contiguous_runs(batch, limit=2))
+        self.assertEqual(runs, [(0, ["a", "b"]), (2, ["c"]), (10, ["d", "e"])])
+
+
+class BrokerServerSocketTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.broker = BrokerServer("127.0.0.1", 0, ModelManager(backend="echo"))
+        self.server = await self.broker.start()
+        port = self.server.sockets[0].getsockname()[1]
+        self.reader, self.writer = await asyncio.open_connection("127.0.0.1", port)
+
+    async def asyncTearDown(self) -> None:
+        if self.writer.can_write_eof() and not self.writer.is_closing():
+            self.writer.write_eof()
+        # Wait for the broker to hang up so its handler has finished before shutdown.
+        await self.reader.read()
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _read_framed(self) -> dict:
+        header = await self.reader.readexactly(FRAME_HEADER_BYTES)
+        return decode_message(await self.reader.readexactly(int.from_bytes(header, "big")))
+
+    async def test_newline_mode_replies_with_newline_frames(self) -> None:
+        self.writer.write(encode_message({"type": "ping"}))
+        self.writer.write(encode_message({"type": "completion", "prompt": "héllo", "stream": False}))
+        self.assertEqual(decode_message(await self.reader.readline()), {"type": "pong"})
+        reply = decode_message(await self.reader.readline())
+        self.assertEqual(reply["result"]["output"], "héllo")
+
+    async def test_newline_mode_handles_leading_blank_line(self) -> None:
+        with self.assertLogs("broker.handlers", level="WARNING"):
+            self.writer.write(b"\n" + encode_message({"type": "ping"}))
+            self.assertEqual(
+                decode_message(await self.reader.readline()),
+                {"type": "error", "message": "invalid_json"},
+            )
+        self.assertEqual(decode_message(await self.reader.readline()), {"type": "pong"})
+
+    async def test_length_prefixed_mode_replies_with_framed_messages(self) -> None:
+        self.writer.write(encode_framed_message({"type": "ping"}))
+        self.writer.write(encode_framed_message({"type": "completion", "prompt": "héllo\nworld"}))
+        self.assertEqual(await self._read_framed(), {"type": "pong"})
+        token = await self._read_framed()
+        self.assertEqual(token, {"type": "token", "index": 0, "token": "héllo\nworld"})
+        completion = await self._read_framed()
+        self.assertEqual(completion["result"]["output"], "héllo\nworld")
+
+    async def test_oversized_frame_closes_connection(self) -> None:
+        self.writer.write(encode_framed_message({"type": "ping"}))
+        self.assertEqual(await self._read_framed(), {"type": "pong"})
+        with self.assertLogs("broker.handlers", level="WARNING") as logs:
+            self.writer.write((1 << 24).to_bytes(FRAME_HEADER_BYTES, "big"))
+            self.assertEqual(await self.reader.read(), b"")
+        self.assertIn("exceeds", logs.output[0])
+
 
 class UtilsTests(unittest.TestCase):
+    def setUp(self) -> None:
+        clear_env_cache()
+
     def test_encode_decode_roundtrip(self) -> None:
         payload = {"type": "pong", "message": "ok"}
         encoded = encode_message(payload)
         self.assertEqual(payload, decode_message(encoded))
 
+    def test_decode_ping_fast_path(self) -> None:
+        for raw in (b'{"type":"ping"}', b'{"type":"ping"}\n', b'{"type": "ping"}\n'):
+            request = decode_message(raw)
+            self.assertIs(decode_message(raw), request)
+            self.assertEqual(request, {"type": "ping"})
+            with self.assertRaises(TypeError):
+                request["type"] = "completion"  # type: ignore[index]
+
+    def test_decode_non_canonical_ping_uses_parser(self) -> None:
+        request = decode_message(b'{"type":"ping","x":1}\n')
+        self.assertEqual(request, {"type": "ping", "x": 1})
+        self.assertIsNot(request, decode_message(b'{"type":"ping"}\n'))
+
+    def test_framed_encode_decode_roundtrip(self) -> None:
+        payload = {"type": "completion", "prompt": "line one\nline two"}
+        framed = encode_framed_message(payload)
+        size = int.from_bytes(framed[:FRAME_HEADER_BYTES], "big")
+        self.assertEqual(size, len(framed) - FRAME_HEADER_BYTES)
+        self.assertEqual(payload, decode_message(framed[FRAME_HEADER_BYTES:]))
+
+    def test_clear_env_cache_picks_up_new_values(self) -> None:
+        with mock.patch.dict(os.environ, {"BROKER_TEST_KEY": "first"}):
+            self.assertEqual(read_env("BROKER_TEST_KEY", "unset"), "first")
+            os.environ["BROKER_TEST_KEY"] = "second"
+            self.assertEqual(read_env("BROKER_TEST_KEY", "unset"), "first")
+            clear_env_cache()
+            self.assertEqual(read_env("BROKER_TEST_KEY", "unset"), "second")
+
 
 if __name__ == "__main__":
     unittest.main()